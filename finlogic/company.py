@@ -23,11 +23,43 @@ RuntimeWarning:
 
 from typing import Literal
 
+import numpy as np
 import pandas as pd
 
 from . import data as dt
 from . import indicators as ic
 
+# Account code prefixes of each report type
+# df['acc_code'].str[0].unique() -> [1, 2, 3, 4, 5, 6, 7]
+# The first part of 'acc_code' is the report type
+# Table of reports correspondence:
+#     1 -> Balance Sheet - Assets
+#     2 -> Balance Sheet - Liabilities and Shareholders’ Equity
+#     3 -> Income
+#     4 -> Comprehensive Income
+#     5 -> Changes in Equity
+#     6 -> Cash Flow (Indirect Method)
+#     7 -> Added Value
+#     8 -> Earnings per Share
+REPORT_TYPES = {
+    "balance_sheet": ("1", "2"),
+    "assets": ("1"),
+    "cash": ("1.01.01", "1.01.02"),
+    "current_assets": ("1.01"),
+    "non_current_assets": ("1.02"),
+    "liabilities": ("2.01", "2.02"),
+    "debt": ("2.01.04", "2.02.01"),
+    "current_liabilities": ("2.01"),
+    "non_current_liabilities": ("2.02"),
+    "liabilities_and_equity": ("2"),
+    "equity": ("2.03"),
+    "income_statement": ("3"),
+    "earnings_per_share": ("3.99"),
+    "cash_flow": ("6"),
+}
+# Report types with EPS accounts (acc_code 3.99...), which are not scaled by unit
+EPS_REPORT_TYPES = {"income_statement", "earnings_per_share"}
+
 
 class Company:
     """A class to represent a company financial data.
@@ -67,6 +99,8 @@ class Company:
         language: Literal["english", "portuguese"] = "english",
     ):
         """Initializes a new instance of the Company class."""
+        # Company data is loaded on first use
+        dt.ensure_loaded()
         self._initialized = False
         self.identifier = identifier
         self.is_consolidated = is_consolidated
@@ -107,19 +141,21 @@ class Company:
 
     @identifier.setter
     def identifier(self, identifier: int | str):
-        # Create custom data frame for ID selection
-        df = (
-            dt.FINANCIALS_DF[["cvm_id", "tax_id", "name_id"]]
-            .query("cvm_id == @identifier or tax_id == @identifier")
-            .drop_duplicates(ignore_index=True)
-        )
-        if not df.empty:
-            self._cvm_id = df.loc[0, "cvm_id"]
-            self.tax_id = df.loc[0, "tax_id"]
-            self.name_id = df.loc[0, "name_id"]
-            self._identifier = identifier
+        # Fiscal IDs are strings and CVM IDs are integers, so only one lookup
+        # table has to be checked
+        if isinstance(identifier, str):
+            cvm_id = dt.TAX_IDS.get(identifier)
         else:
+            cvm_id = identifier if identifier in dt.CVM_ROWS else None
+        if cvm_id is None:
             raise KeyError(f"Company 'identifier' {identifier} not found.")
+        # Company attributes are taken from its first row in the database. The
+        # values are read from each column, without building the whole row.
+        first_row = dt.CVM_ROWS[cvm_id].start
+        self._cvm_id = int(dt.FINANCIALS_DF["cvm_id"].iat[first_row])
+        self.tax_id = dt.FINANCIALS_DF["tax_id"].iat[first_row]
+        self.name_id = dt.FINANCIALS_DF["name_id"].iat[first_row]
+        self._identifier = identifier
         # If object was already initialized, reset company dataframe
         if self._initialized:
             self._set_df()
@@ -191,9 +227,11 @@ class Company:
             case _:
                 raise ValueError("Accounting Unit is invalid")
 
-        # If object was already initialized, reset company dataframe
+        # The unit is applied to the reports, so the company dataframe is kept
+        # and only the reports built with the previous unit are discarded
         if self._initialized:
-            self._set_df()
+            self._reports = {}
+            self._indicators = {}
 
     @property
     def tax_rate(self) -> float:
@@ -259,39 +297,52 @@ class Company:
         This method creates a dataframe with the company's financial
         statements.
         """
-        expr = "cvm_id == @self._cvm_id and is_consolidated == @self._is_consolidated"
-        df = dt.FINANCIALS_DF.query(expr).reset_index(drop=True)
-
-        # Convert category columns back to string
-        columns = df.columns
-        cat_cols = [c for c in columns if df[c].dtype == "category"]
-        df[cat_cols] = df[cat_cols].astype("string")
-
-        # Adjust for unit change only where it is not EPS (acc_code 8...)
-        mask = ~df["acc_code"].str.startswith("3.99")
-        df.loc[mask, "acc_value"] = df.loc[mask, "acc_value"] / self._acc_unit
+        # The company rows are a contiguous slice of the financials, sorted by
+        # accounting method (separate first), so the selected method is also a
+        # slice. The columns that are already company attributes are left out, so
+        # only the used data is copied.
+        rows = dt.CVM_ROWS[self._cvm_id]
+        is_consolidated = dt.FINANCIALS_DF["is_consolidated"].to_numpy()[rows]
+        split = rows.start + np.searchsorted(is_consolidated, True)
+        if self._is_consolidated:
+            rows = slice(split, rows.stop)
+        else:
+            rows = slice(rows.start, split)
+        columns = dt.FINANCIALS_DF.columns
+        drop_cols = ["name_id", "cvm_id", "tax_id", "is_consolidated"]
+        col_positions = columns.get_indexer(columns.drop(drop_cols))
+        df = dt.FINANCIALS_DF.iloc[rows, col_positions]
+        df.index = pd.RangeIndex(len(df))
 
         self._first_period = df["period_end"].min()
         self._last_period = df["period_end"].max()
 
         # Not necessarily there will be a quarterly report for the last period
-        self._last_annual = df.query("is_annual")["period_end"].max()
+        is_annual = df["is_annual"].to_numpy()
+        self._last_annual = df["period_end"][is_annual].max()
 
-        if self._last_period == self._last_annual:
+        # NaT never compares equal, so a company without data is checked apart
+        if pd.isna(self._last_period) or self._last_period == self._last_annual:
             self._last_period_type = "annual"
             self._last_quarterly = None
         else:
             self._last_period_type = "quarterly"
-            self._last_quarterly = df.query("not is_annual")["period_end"].max()
+            self._last_quarterly = df["period_end"][~is_annual].max()
 
-        # Drop columns that are already company attributes or will not be used
-        df.drop(
-            columns=["name_id", "cvm_id", "tax_id", "is_consolidated"],
-            inplace=True,
-        )
+        # Number of dots of each account code, used to filter account levels.
+        # The dots are counted once per category and gathered by category code.
+        acc_codes = df["acc_code"].cat
+        category_dots = acc_codes.categories.str.count(r"\.").to_numpy(dtype=np.int8)
+        self._acc_code_dots = category_dots[acc_codes.codes.to_numpy()]
+
+        # Reports show only the last quarter of the quarterly data
+        self._last_quarters = self._last_quarters_mask(df)
 
         # Set company data frame
         self._df = df
+        self._report_type_masks = {}
+        self._reports = {}
+        self._indicators = {}
 
     def info(self) -> pd.DataFrame:
         """Print a concise summary of a company."""
@@ -317,55 +368,83 @@ class Company:
         s.name = "Company Info"
         return s.to_frame()
 
+    @staticmethod
+    def _is_last_entry(*keys: np.ndarray) -> np.ndarray:
+        """Mark the last row of each run of equal keys.
+
+        The company rows are sorted by account code and period at load, so the
+        last entry published for a key is the one before the key changes.
+        """
+        is_last = np.ones(len(keys[0]), dtype=bool)
+        is_last[:-1] = np.logical_or.reduce([key[1:] != key[:-1] for key in keys])
+        return is_last
+
     @staticmethod
     def _build_report_index(dfi: pd.DataFrame) -> pd.DataFrame:
         """Build the index for the report. This function is used by the
         _build_report function. The index is built from the annual reports
-        "acc_code" works as a primary key. Other columns set the preference order
+        "acc_code" works as a primary key. The account name is taken from the
+        last period of each account code.
         """
-        df = (
-            dfi[["acc_code", "acc_name", "period_end"]]
-            .sort_values(by=["acc_code", "period_end"])
-            .drop_duplicates(subset=["acc_code"], keep="last", ignore_index=True)[
-                ["acc_code", "acc_name"]
-            ]
-        )
-        return df
+        acc_codes = dfi["acc_code"].cat.codes.to_numpy()
+        is_last = Company._is_last_entry(acc_codes)
+        df = dfi.loc[is_last, ["acc_code", "acc_name"]].astype(str)
+        return df.reset_index(drop=True)
 
     def _build_report(self, dfi: pd.DataFrame) -> pd.DataFrame:
         # Start "dfo" with the index
         dfo = self._build_report_index(dfi)
-        year_cols = ["acc_code", "acc_value"]
-        periods = sorted(dfi["period_end"].drop_duplicates())
-        for period in periods:
-            df_year = dfi.query("period_end == @period")[year_cols].copy()
-            period_str = period.strftime("%Y-%m-%d")
-            if period == self._last_period and self._last_period_type == "quarterly":
-                period_str += " ltm"
-            df_year.rename(columns={"acc_value": period_str}, inplace=True)
-            dfo = pd.merge(dfo, df_year, how="left", on=["acc_code"])
+        # Spread the periods into columns in a single reshape. Rows are unique
+        # after keeping the last entry of each key, so no aggregation is needed.
+        acc_codes = dfi["acc_code"].cat.codes.to_numpy()
+        is_last = self._is_last_entry(acc_codes, dfi["period_end"].to_numpy())
+        key_cols = ["acc_code", "period_end"]
+        df_periods = (
+            dfi.loc[is_last, ["acc_code", "period_end", "acc_value"]]
+            .set_index(key_cols)["acc_value"]
+            .unstack("period_end")
+        )
+        period_names = {p: p.strftime("%Y-%m-%d") for p in df_periods.columns}
+        if self._last_period_type == "quarterly" and self._last_period in period_names:
+            period_names[self._last_period] += " ltm"
+        df_periods = df_periods.rename(columns=period_names).reset_index()
+        df_periods["acc_code"] = df_periods["acc_code"].astype(str)
+        dfo = pd.merge(dfo, df_periods, how="left", on=["acc_code"])
         dfo.fillna(0, inplace=True)
         return dfo.sort_values("acc_code", ignore_index=True)
 
     @staticmethod
-    def _remove_not_last_quarters(df: pd.DataFrame) -> pd.DataFrame:
-        """Remove quarters that are not the last one.
+    def _last_quarters_mask(df: pd.DataFrame) -> np.ndarray:
+        """Select all rows except the quarters that are not the last one.
 
-        This function removes quarters that are not the last one.
+        This function masks out quarters that are not the last one.
         This is useful when generating reports.
 
         Args:
             df: Dataframe with the financial statements.
 
         Returns:
-            Dataframe with the financial statements without the quarters that are not
-            the last one.
+            Boolean array that is False for the quarters that are not the last
+            one.
         """
-        mask1 = ~df["is_annual"]
-        mask2 = df["period_end"] != df["period_end"].max()
-        mask = mask1 & mask2
-        df = df[~mask].reset_index(drop=True)
-        return df
+        mask1 = ~df["is_annual"].to_numpy()
+        mask2 = df["period_end"].to_numpy() != df["period_end"].max()
+        return ~(mask1 & mask2)
+
+    def _report_type_mask(self, report_type: str) -> np.ndarray:
+        """Select the company rows that belong to a report type.
+
+        The masks are kept until the company dataframe is reset, so the account
+        code prefixes are matched only once per report type.
+        """
+        if report_type not in self._report_type_masks:
+            # Match the prefixes once per category and gather by category code
+            acc_codes = self._df["acc_code"].cat
+            prefixes = REPORT_TYPES[report_type]
+            is_type = np.asarray(acc_codes.categories.str.startswith(prefixes))
+            mask = is_type[acc_codes.codes.to_numpy()]
+            self._report_type_masks[report_type] = mask
+        return self._report_type_masks[report_type]
 
     def report(
         self,
@@ -427,17 +506,50 @@ class Company:
         Raises:
             ValueError: If some argument is invalid.
         """
-        # Copy company dataframe to avoid changing it
-        df = self._df.copy()
-        df = self._remove_not_last_quarters(df)
         # Check input arguments.
         if acc_level not in [0, 1, 2, 3, 4]:
             raise ValueError("acc_level expects 0, 1, 2, 3 or 4")
 
+        # Reports are cached until the company dataframe is reset
+        key = (report_type, acc_level, num_years, self._language)
+        if key not in self._reports:
+            self._reports[key] = self._make_report(report_type, acc_level, num_years)
+        # Return a copy so changes made by the caller do not reach the cache
+        return self._reports[key].copy()
+
+    def _make_report(
+        self, report_type: str, acc_level: int, num_years: int
+    ) -> pd.DataFrame:
+        """Generate a report with the arguments already checked by 'report'."""
+        # Select the report rows with a single boolean mask
+        mask = self._report_type_mask(report_type) & self._last_quarters
+
         # Filter dataframe for selected acc_level
         # Example of an acc_code: "7.08.04.04" -> 4 levels and 3 dots
         if acc_level:
-            df.query(rf"acc_code.str.count('\\.') <= {acc_level - 1}", inplace=True)
+            mask &= self._acc_code_dots <= acc_level - 1
+
+        # Show only selected years. The selected periods are the last ones, so
+        # a single comparison with the first of them is enough.
+        period_end = self._df["period_end"].to_numpy()
+        all_periods = np.unique(period_end[mask])
+        if 0 < num_years < len(all_periods):
+            mask &= period_end >= all_periods[-num_years]
+
+        # The selected rows are only read, so they need no further copies
+        dfo = self._build_report(self._df[mask])
+
+        # Adjust for unit change only where it is not EPS (acc_code 3.99...).
+        # The report has one row per account, which is much cheaper to scale
+        # than the selected rows, and the default unit needs no scaling at all.
+        # Only the reports that can have EPS accounts need to look for them.
+        if self._acc_unit != 1:
+            period_cols = dfo.columns[2:]
+            if report_type in EPS_REPORT_TYPES:
+                is_eps = dfo["acc_code"].str.startswith("3.99").to_numpy()
+                dfo.loc[~is_eps, period_cols] /= self._acc_unit
+            else:
+                dfo[period_cols] = dfo[period_cols] / self._acc_unit
 
         # Set language
         class MyDict(dict):
@@ -446,51 +558,14 @@ class Company:
             def __missing__(self, key):
                 return "(pt) " + key
 
+        # Account names are translated in the report, which has one row per
+        # account
         if self._language == "English":
             _pten_dict = dict(dt.LANGUAGE_DF.values)
             _pten_dict = MyDict(_pten_dict)
-            df["acc_name"] = df["acc_name"].map(_pten_dict)
+            dfo["acc_name"] = dfo["acc_name"].map(_pten_dict)
 
-        """
-        Filter dataframe for selected acc_code
-        df['acc_code'].str[0].unique() -> [1, 2, 3, 4, 5, 6, 7]
-        The first part of 'acc_code' is the report type
-        Table of reports correspondence:
-            1 -> Balance Sheet - Assets
-            2 -> Balance Sheet - Liabilities and Shareholders’ Equity
-            3 -> Income
-            4 -> Comprehensive Income
-            5 -> Changes in Equity
-            6 -> Cash Flow (Indirect Method)
-            7 -> Added Value
-            8 -> Earnings per Share
-        """
-        report_types = {
-            "balance_sheet": ("1", "2"),
-            "assets": ("1"),
-            "cash": ("1.01.01", "1.01.02"),
-            "current_assets": ("1.01"),
-            "non_current_assets": ("1.02"),
-            "liabilities": ("2.01", "2.02"),
-            "debt": ("2.01.04", "2.02.01"),
-            "current_liabilities": ("2.01"),
-            "non_current_liabilities": ("2.02"),
-            "liabilities_and_equity": ("2"),
-            "equity": ("2.03"),
-            "income_statement": ("3"),
-            "earnings_per_share": ("3.99"),
-            "cash_flow": ("6"),
-        }
-        acc_codes = report_types[report_type]  # noqa
-        df.query("acc_code.str.startswith(@acc_codes)", inplace=True)
-        df.reset_index(drop=True, inplace=True)
-
-        # Show only selected years
-        all_periods = sorted(df["period_end"].drop_duplicates())
-        selected_periods = all_periods[-num_years:]  # noqa
-        df.query("period_end in @selected_periods", inplace=True)
-
-        return self._build_report(df)
+        return dfo
 
     def custom_report(
         self,
@@ -514,11 +589,8 @@ class Company:
         df_bs = self.report("balance_sheet", num_years=num_years)
         df_is = self.report("income_statement", num_years=num_years)
         df_cf = self.report("cash_flow", num_years=num_years)
-        df = (
-            pd.concat([df_bs, df_is, df_cf])
-            .query(f"acc_code == {acc_list}")
-            .reset_index(drop=True)
-        )
+        df = pd.concat([df_bs, df_is, df_cf])
+        df = df[df["acc_code"].isin(acc_list)].reset_index(drop=True)
         return df
 
     def indicators(self, num_years: int = 0) -> pd.DataFrame:
@@ -531,13 +603,20 @@ class Company:
         Returns:
             pd.DataFrame: Dataframe containing calculated financial indicators.
         """
-        expr = "cvm_id == @self._cvm_id and is_consolidated == @self._is_consolidated"
-        df = dt.INDICATORS_DF.query(expr)
+        # Indicators are cached until the company dataframe or unit is reset
+        if num_years not in self._indicators:
+            self._indicators[num_years] = self._make_indicators(num_years)
+        # Return a copy so changes made by the caller do not reach the cache
+        return self._indicators[num_years].copy()
+
+    def _make_indicators(self, num_years: int) -> pd.DataFrame:
+        """Calculate the indicators with the arguments set by 'indicators'."""
+        # Take the company rows by their positions in the indicators data
+        key = (self._cvm_id, self._is_consolidated)
+        df = dt.INDICATORS_DF.take(dt.INDICATORS_ROWS.get(key, []))
         df = ic.format_indicators(df, unit=self._acc_unit)
-        # Columns cvm_id and is_consolidated are redundant for the Company class
-        df.drop(columns=["cvm_id", "is_consolidated"], inplace=True)
         # Show only the selected number of years
         if num_years > 0:
-            df = df[df.columns[-num_years:]].copy()
+            df = df[df.columns[-num_years:]]
 
         return df
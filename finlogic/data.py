@@ -6,8 +6,10 @@ as well as searching for company names in the FinLogic Database and retrieving
 information about the database itself.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal
 
+import numpy as np
 import pandas as pd
 
 from . import indicators as ind
@@ -19,10 +21,42 @@ TRADED_FINANCIALS_URL = f"{DATA_REPO}traded_companies_financials.csv.gz"
 NOT_TRADED_FINANCIALS_URL = f"{DATA_REPO}not_traded_companies_financials.csv.gz"
 LANGUAGE_DATA_URL = f"{DATA_REPO}pten_df.csv.gz"
 
+# Column types of the data files. Declaring them up front spares the CSV parser
+# from inferring the types of every column during the load. CVM IDs fit in 32
+# bits and the few trading segments are stored as categories.
+FINANCIALS_DTYPES = {
+    "name_id": "str",
+    "cvm_id": "int32",
+    "tax_id": "str",
+    "is_annual": "bool",
+    "is_consolidated": "bool",
+    "acc_code": "str",
+    "acc_name": "str",
+    "acc_value": "float64",
+}
+TRADES_DTYPES = {
+    "cvm_id": "int32",
+    "segment": "category",
+    "is_restructuring": "bool",
+    "most_traded_stock": "str",
+}
+# Column types of the search and rank results, as read from the data files
+RESULT_DTYPES = {"name_id": "str", "cvm_id": "int64", "tax_id": "str", "segment": "str"}
+
 FINANCIALS_DF = pd.DataFrame()
 TRADES_DF = pd.DataFrame()
 LANGUAGE_DF = pd.DataFrame()
 INDICATORS_DF = pd.DataFrame()
+# Row slice of each company in FINANCIALS_DF (sorted by company), keyed by cvm_id
+CVM_ROWS: dict[int, slice] = {}
+# Row positions in INDICATORS_DF, keyed by (cvm_id, is_consolidated)
+INDICATORS_ROWS: dict[tuple[int, bool], np.ndarray] = {}
+# One row per company with its identifiers
+COMPANIES_DF = pd.DataFrame()
+# Company cvm_id keyed by tax_id
+TAX_IDS: dict[str, int] = {}
+# Summary returned by 'info', built on its first call after each load
+INFO_DF = pd.DataFrame()
 
 
 def load(is_traded: bool = True, min_volume: int = 100_000):
@@ -41,26 +75,83 @@ def load(is_traded: bool = True, min_volume: int = 100_000):
     global LANGUAGE_DF
     global TRADES_DF
     global FINANCIALS_DF
-    print('✔ Loading "language" data...')
-    LANGUAGE_DF = pd.read_csv(LANGUAGE_DATA_URL)
-    print("✔ Loading trading data...")
-    TRADES_DF = pd.read_csv(TRADE_DATA_URL)
-    print("✔ Loading financials data...")
-    date_cols = ["period_begin", "period_end"]
-    FINANCIALS_DF = pd.read_csv(TRADED_FINANCIALS_URL, parse_dates=date_cols)
+    read_args = {
+        "dtype": FINANCIALS_DTYPES,
+        "parse_dates": ["period_begin", "period_end"],
+    }
+    financials_urls = [TRADED_FINANCIALS_URL]
     if not is_traded:
-        df_not_traded = pd.read_csv(NOT_TRADED_FINANCIALS_URL, parse_dates=date_cols)
-        FINANCIALS_DF = pd.concat([FINANCIALS_DF, df_not_traded], ignore_index=True)
-    TRADES_DF.query("volume >= @min_volume", inplace=True)
-    traded_cvm_ids = TRADES_DF["cvm_id"].unique()  # noqa
-    FINANCIALS_DF.query("cvm_id in @traded_cvm_ids", inplace=True)
-    FINANCIALS_DF = FINANCIALS_DF.reset_index(drop=True)
+        financials_urls.append(NOT_TRADED_FINANCIALS_URL)
+    # The files are downloaded concurrently, since most of the load time is
+    # spent waiting for the network. Each step is reported once its file is
+    # read, and download errors are raised by the 'result' calls.
+    with ThreadPoolExecutor() as executor:
+        language_future = executor.submit(pd.read_csv, LANGUAGE_DATA_URL)
+        trades_future = executor.submit(
+            pd.read_csv, TRADE_DATA_URL, dtype=TRADES_DTYPES
+        )
+        financials_futures = [
+            executor.submit(pd.read_csv, url, **read_args) for url in financials_urls
+        ]
+        LANGUAGE_DF = language_future.result()
+        print('✔ Loading "language" data...')
+        TRADES_DF = trades_future.result()
+        print("✔ Loading trading data...")
+        TRADES_DF.query("volume >= @min_volume", inplace=True)
+        traded_cvm_ids = TRADES_DF["cvm_id"].unique()
+        # Each file is filtered as soon as it is read, so the rows of companies
+        # without enough volume are never concatenated
+        dfs = []
+        for future in financials_futures:
+            df = future.result()
+            dfs.append(df[df["cvm_id"].isin(traded_cvm_ids)])
+        print("✔ Loading financials data...")
+    # Rows are grouped by company and accounting method, so each of them is a
+    # contiguous slice, ordered by account code and period as in the reports.
+    # The sort is stable, so repeated entries keep their publication order.
+    sort_cols = ["cvm_id", "is_consolidated", "acc_code", "period_end"]
+    FINANCIALS_DF = pd.concat(dfs).sort_values(
+        by=sort_cols, kind="stable", ignore_index=True
+    )
+    # Repeated text values are stored as categories. Besides saving memory, the
+    # string methods of a category column run once per category, not per row.
+    cat_cols = ["name_id", "tax_id", "acc_code", "acc_name"]
+    FINANCIALS_DF[cat_cols] = FINANCIALS_DF[cat_cols].astype("category")
+    global CVM_ROWS
+    cvm_ids, starts = np.unique(FINANCIALS_DF["cvm_id"].to_numpy(), return_index=True)
+    stops = np.append(starts[1:], len(FINANCIALS_DF))
+    CVM_ROWS = {
+        cvm_id: slice(start, stop)
+        for cvm_id, start, stop in zip(cvm_ids.tolist(), starts, stops)
+    }
+    global COMPANIES_DF
+    COMPANIES_DF = FINANCIALS_DF[["cvm_id", "tax_id", "name_id"]].drop_duplicates(
+        subset=["cvm_id"], ignore_index=True
+    )
+    global TAX_IDS
+    df_tax_ids = COMPANIES_DF.drop_duplicates(subset=["tax_id"])
+    TAX_IDS = dict(zip(df_tax_ids["tax_id"], df_tax_ids["cvm_id"]))
     print("✔ Building indicators data...")
     global INDICATORS_DF
     INDICATORS_DF = ind.build_indicators(FINANCIALS_DF)
+    global INDICATORS_ROWS
+    gp_cols = ["cvm_id", "is_consolidated"]
+    INDICATORS_ROWS = INDICATORS_DF.groupby(gp_cols, sort=False).indices
+    global INFO_DF
+    INFO_DF = pd.DataFrame()
     print("✔ FinLogic is ready!")
 
 
+def ensure_loaded():
+    """Load FinLogic data with the default arguments if it was not loaded yet.
+
+    This allows the data to be loaded on first use, instead of requiring an
+    explicit call to 'load'.
+    """
+    if FINANCIALS_DF.empty:
+        load()
+
+
 def info() -> pd.DataFrame:
     """Print a concise summary of FinLogic available data.
 
@@ -76,9 +167,18 @@ def info() -> pd.DataFrame:
 
     Returns: None
     """
-    info = {}
     if FINANCIALS_DF.empty:
         return pd.DataFrame()
+    # The data only changes on load, so the summary is computed once per load
+    global INFO_DF
+    if INFO_DF.empty:
+        INFO_DF = _build_info()
+    return INFO_DF.copy()
+
+
+def _build_info() -> pd.DataFrame:
+    """Build the summary of FinLogic available data returned by 'info'."""
+    info = {}
 
     info["data_url"] = f"{TRADED_FINANCIALS_URL}"
     data_size = (
@@ -88,14 +188,18 @@ def info() -> pd.DataFrame:
     info["memory_usage"] = f"{data_size / 1024**2:.1f} MB"
     # info["updated_on"] = db_last_modified.strftime("%Y-%m-%d %H:%M:%S")
 
-    info["accounting_entries"] = FINANCIALS_DF.shape[0]
+    info["accounting_entries"] = len(FINANCIALS_DF)
 
+    # A single pass over the rows finds the unique reports, and the first and
+    # last reports are taken from their periods
     report_cols = ["cvm_id", "is_annual", "period_end"]
-    info["number_of_reports"] = FINANCIALS_DF[report_cols].drop_duplicates().shape[0]
-    info["first_report"] = FINANCIALS_DF["period_end"].min().strftime("%Y-%m-%d")
-    info["last_report"] = FINANCIALS_DF["period_end"].max().strftime("%Y-%m-%d")
+    df_reports = FINANCIALS_DF.groupby(report_cols, sort=False, dropna=False)
+    report_periods = df_reports.size().index.get_level_values("period_end")
+    info["number_of_reports"] = len(report_periods)
+    info["first_report"] = report_periods.min().strftime("%Y-%m-%d")
+    info["last_report"] = report_periods.max().strftime("%Y-%m-%d")
 
-    info["number_of_companies"] = FINANCIALS_DF["cvm_id"].nunique()
+    info["number_of_companies"] = len(CVM_ROWS)
 
     s = pd.Series(info)
     s.name = "FinLogic Info"
@@ -103,10 +207,16 @@ def info() -> pd.DataFrame:
     return s.to_frame()
 
 
+def _with_result_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the identifier columns of a search result to RESULT_DTYPES."""
+    return df.astype({col: RESULT_DTYPES[col] for col in RESULT_DTYPES if col in df})
+
+
 def search_segment(search_value: str):
+    ensure_loaded()
     series = TRADES_DF["segment"].drop_duplicates().sort_values(ignore_index=True)
-    mask = series.str.contains(search_value)
-    return series[mask].reset_index(drop=True)
+    mask = series.str.contains(search_value, regex=False, na=False)
+    return series[mask].reset_index(drop=True).astype(RESULT_DTYPES["segment"])
 
 
 def search_company(
@@ -130,21 +240,22 @@ def search_company(
             'name_id', 'cvm_id', and 'tax_id' for each unique company that
             matches the search criteria.
     """
-    search_cols = ["name_id", "cvm_id", "tax_id"]
-    df = FINANCIALS_DF[search_cols].drop_duplicates(
-        subset=["cvm_id"], ignore_index=True
-    )
-    df = pd.merge(df, TRADES_DF, on="cvm_id")
+    ensure_loaded()
+    # The companies table has one row per company
+    df = pd.merge(COMPANIES_DF, TRADES_DF, on="cvm_id")
     match search_by:
         case "name_id":
-            # Company name is stored in uppercase in the database
-            df.query(f"name_id.str.contains('{search_value.upper()}')", inplace=True)
+            # Company name is stored in uppercase in the database. Plain
+            # substring matching spares compiling a regular expression.
+            search_value = search_value.upper()
+            mask = df["name_id"].str.contains(search_value, regex=False, na=False)
         case "cvm_id":
-            df.query(f"cvm_id == {search_value}", inplace=True)
+            # A search value that is not an integer raises a ValueError
+            mask = df["cvm_id"] == int(search_value)
         case "tax_id":
-            df.query(f"tax_id == '{search_value}'", inplace=True)
+            mask = df["tax_id"] == search_value
         case "segment":
-            df.query(f"segment.str.contains('{search_value}')", inplace=True)
+            mask = df["segment"].str.contains(search_value, regex=False, na=False)
         case _:
             raise ValueError("Invalid value for 'search_by' argument.")
 
@@ -156,7 +267,8 @@ def search_company(
         "is_restructuring",
         "most_traded_stock",
     ]
-    return df[show_cols].reset_index(drop=True)
+    df = df.loc[mask, show_cols].reset_index(drop=True)
+    return _with_result_dtypes(df)
 
 
 def rank(
@@ -182,6 +294,7 @@ def rank(
             'operating_margin', 'net_margin', 'return_on_assets',
             'return_on_equity', 'roic'.
     """
+    ensure_loaded()
     show_cols = [
         "name_id",
         "most_traded_stock",
@@ -192,19 +305,21 @@ def rank(
         "period_end",
         rank_by,
     ]
+    # Only the columns used in the ranking are sorted to find the last reports
+    last_report_cols = ["cvm_id", "name_id", "period_end", "is_consolidated"]
     df = (
-        FINANCIALS_DF.sort_values(
-            by=["cvm_id", "period_end", "is_consolidated"], ignore_index=True
-        )
+        FINANCIALS_DF[last_report_cols]
+        .sort_values(by=["cvm_id", "period_end", "is_consolidated"], ignore_index=True)
         .drop_duplicates(subset=["cvm_id"], keep="last")
         .merge(TRADES_DF, on="cvm_id")
         .merge(
             INDICATORS_DF[["cvm_id", rank_by, "is_consolidated", "period_end"]],
             on=["cvm_id", "period_end", "is_consolidated"],
         )
-        .query("segment.str.contains(@segment) and is_consolidated == @is_consolidated")
-        .sort_values(by=[rank_by], ascending=False, ignore_index=True)
-        .head(n)[show_cols]
     )
+    mask = df["is_consolidated"] == is_consolidated
+    if segment:
+        mask &= df["segment"].str.contains(segment, regex=False, na=False)
+    df = df[mask].sort_values(by=[rank_by], ascending=False, ignore_index=True)
 
-    return df
+    return _with_result_dtypes(df.head(n)[show_cols])
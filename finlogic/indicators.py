@@ -1,6 +1,8 @@
 import pandas as pd
 
 TAX_RATE = 0.34
+# Ratios with a base value below the cut off are set to zero
+CUT_OFF_VALUE = 1_000_000
 INDICATORS_CODES = {
     "1": "total_assets",
     "1.01": "current_assets",
@@ -23,21 +25,21 @@ INDICATORS_CODES = {
 
 
 def filter_indicators_data(dfi: pd.DataFrame) -> pd.DataFrame:
-    codes = list(INDICATORS_CODES.keys())  # noqa
+    codes = list(INDICATORS_CODES.keys())
     """There are 137 repeated entries in 208784 rows. These are from companies
     with some exotic period_end dates, as for cvm_id 3450. These entries will be
     removed in the next step, when we drop duplicates and the last entry
     published will be kept.
     """
     drop_cols = ["tax_id", "acc_name", "period_begin"]
-    sort_cols = ["cvm_id", "is_consolidated", "acc_code", "period_end"]
+    # The financials are already sorted by these columns at load, so the
+    # duplicates are dropped on the key columns without sorting them again
     subset_cols = ["cvm_id", "is_consolidated", "acc_code", "period_end"]
 
     dfo = (
-        dfi.query("acc_code in @codes")
+        dfi[dfi["acc_code"].isin(codes)]
         .drop(columns=drop_cols)
         # .query("cvm_id == 9512 and is_consolidated")  # for testing
-        .sort_values(by=sort_cols, ignore_index=True)
         .drop_duplicates(subset=subset_cols, keep="last", ignore_index=True)
         .astype({"acc_code": "string"})
     )
@@ -54,46 +56,50 @@ def pivot_df(df) -> pd.DataFrame:
     return dfp
 
 
-def insert_annual_avg_col(col_name: str, df: pd.DataFrame) -> pd.DataFrame:
+def insert_annual_avg_cols(col_names: list[str], df: pd.DataFrame) -> pd.DataFrame:
     gp_cols = ["cvm_id", "is_annual", "is_consolidated"]
-    col_name_p = f"{col_name}_p"
-    avg_col_name = f"avg_{col_name}"
-    df[col_name_p] = df.groupby(by=gp_cols)[col_name].shift(1)
-    df[col_name_p] = df[col_name_p].fillna(df[col_name])
-    df[avg_col_name] = (df[col_name] + df[col_name_p]) / 2
-    df.drop(columns=[col_name_p], inplace=True)
-    return df
+    # All columns are shifted in one groupby pass
+    df_p = df.groupby(by=gp_cols)[col_names].shift(1)
+    df_p = df_p.fillna(df[col_names])
+    df_avg = ((df[col_names] + df_p) / 2).add_prefix("avg_")
+    return df.join(df_avg)
 
 
-def insert_quarterly_avg_col(col_name: str, df: pd.DataFrame) -> pd.DataFrame:
+def insert_quarterly_avg_cols(col_names: list[str], df: pd.DataFrame) -> pd.DataFrame:
     gp_cols = ["cvm_id", "is_annual", "is_consolidated"]
-    col_name_p4 = f"{col_name}_p4"
-    col_name_p1 = f"{col_name}_p1"
-    col_name_p = f"{col_name}_p"
-    avg_col_name = f"avg_{col_name}"
-    df[col_name_p4] = df.groupby(by=gp_cols)[col_name].shift(4)
-    df[col_name_p1] = df.groupby(by=gp_cols)[col_name].shift(1)
-    df[col_name_p] = df[col_name_p4].fillna(df[col_name_p1])
-    df[col_name_p] = df[col_name_p].fillna(df[col_name])
-    df[avg_col_name] = (df[col_name] + df[col_name_p]) / 2
-    df.drop(columns=[col_name_p4, col_name_p1, col_name_p], inplace=True)
-    return df
+    # All columns are shifted in one groupby pass for each lag
+    df_gp = df.groupby(by=gp_cols)[col_names]
+    df_p = df_gp.shift(4).fillna(df_gp.shift(1))
+    df_p = df_p.fillna(df[col_names])
+    df_avg = ((df[col_names] + df_p) / 2).add_prefix("avg_")
+    return df.join(df_avg)
 
 
 def insert_key_cols(df: pd.DataFrame) -> pd.DataFrame:
-    df["total_cash"] = df["cash_equivalents"] + df["financial_investments"]
-    df.drop(columns=["cash_equivalents", "financial_investments"], inplace=True)
-
-    df["total_debt"] = df["short_term_debt"] + df["long_term_debt"]
-    df["net_debt"] = df["total_debt"] - df["total_cash"]
-    df.drop(columns=["short_term_debt", "long_term_debt"], inplace=True)
+    # The key columns are computed from the source columns and joined to the
+    # frame in a single step
+    total_cash = df["cash_equivalents"] + df["financial_investments"]
+    total_debt = df["short_term_debt"] + df["long_term_debt"]
+    key_cols = {
+        "total_cash": total_cash,
+        "total_debt": total_debt,
+        "net_debt": total_debt - total_cash,
+        "working_capital": df["current_assets"] - df["current_liabilities"],
+        "effective_tax_rate": -1 * df["effective_tax"] / df["ebt"],
+        "ebitda": df["ebit"] + df["depreciation_amortization"],
+        "invested_capital": total_debt + df["equity"] - total_cash,
+    }
+    drop_cols = [
+        "cash_equivalents",
+        "financial_investments",
+        "short_term_debt",
+        "long_term_debt",
+    ]
+    return pd.concat([df.drop(columns=drop_cols), pd.DataFrame(key_cols)], axis=1)
 
-    df["working_capital"] = df["current_assets"] - df["current_liabilities"]
-    df["effective_tax_rate"] = -1 * df["effective_tax"] / df["ebt"]
-    df["ebitda"] = df["ebit"] + df["depreciation_amortization"]
-    df["invested_capital"] = df["total_debt"] + df["equity"] - df["total_cash"]
 
-    return df
+def calculate_ratio(numerator: pd.Series, base: pd.Series) -> pd.Series:
+    return (numerator / base).mask(base <= CUT_OFF_VALUE, 0)
 
 
 def process_indicators(df: pd.DataFrame, is_annual: bool) -> pd.DataFrame:
@@ -101,11 +107,10 @@ def process_indicators(df: pd.DataFrame, is_annual: bool) -> pd.DataFrame:
     df = insert_key_cols(df)
 
     avg_cols = ["invested_capital", "total_assets", "equity"]
-    for col_name in avg_cols:
-        if is_annual:
-            df = insert_annual_avg_col(col_name, df)
-        else:
-            df = insert_quarterly_avg_col(col_name, df)
+    if is_annual:
+        df = insert_annual_avg_cols(avg_cols, df)
+    else:
+        df = insert_quarterly_avg_cols(avg_cols, df)
 
     # For quarterly data, we need only the last row of each group
     if not is_annual:
@@ -113,21 +118,17 @@ def process_indicators(df: pd.DataFrame, is_annual: bool) -> pd.DataFrame:
         df = df.groupby(by=gp_cols).tail(1).dropna().reset_index(drop=True)
 
     # Margin ratios
-    CUT_OFF_VALUE = 1_000_000
-    df["gross_margin"] = df["gross_profit"] / df["revenues"]
-    df["ebitda_margin"] = df["ebitda"] / df["revenues"]
-    df["operating_margin"] = df["ebit"] / df["revenues"]
-    df["net_margin"] = df["net_income"] / df["revenues"]
-    margin_cols = ["gross_margin", "ebitda_margin", "operating_margin", "net_margin"]
-    df.loc[df["revenues"] <= CUT_OFF_VALUE, margin_cols] = 0
+    revenues = df["revenues"]
+    df["gross_margin"] = calculate_ratio(df["gross_profit"], revenues)
+    df["ebitda_margin"] = calculate_ratio(df["ebitda"], revenues)
+    df["operating_margin"] = calculate_ratio(df["ebit"], revenues)
+    df["net_margin"] = calculate_ratio(df["net_income"], revenues)
 
     # Return ratios
-    df["return_on_assets"] = df["ebit"] * (1 - TAX_RATE) / df["avg_total_assets"]
-    df.loc[df["avg_total_assets"] <= CUT_OFF_VALUE, "return_on_assets"] = 0
-    df["return_on_equity"] = df["ebit"] * (1 - TAX_RATE) / df["avg_equity"]
-    df.loc[df["avg_equity"] <= CUT_OFF_VALUE, "return_on_equity"] = 0
-    df["roic"] = df["ebit"] * (1 - TAX_RATE) / df["avg_invested_capital"]
-    df.loc[df["avg_invested_capital"] <= CUT_OFF_VALUE, "roic"] = 0
+    nopat = df["ebit"] * (1 - TAX_RATE)
+    df["return_on_assets"] = calculate_ratio(nopat, df["avg_total_assets"])
+    df["return_on_equity"] = calculate_ratio(nopat, df["avg_equity"])
+    df["roic"] = calculate_ratio(nopat, df["avg_invested_capital"])
 
     # Drop avg_cols
     avg_cols = ["avg_total_assets", "avg_equity", "avg_invested_capital"]
@@ -176,7 +177,8 @@ def adjust_unit(df: pd.DataFrame, unit: float) -> pd.DataFrame:
         "ebitda",
         "invested_capital",
     ]
-    df.loc[:, currency_cols] /= unit
+    if unit != 1:
+        df.loc[:, currency_cols] /= unit
     return df
 
 
@@ -215,20 +217,11 @@ def reorder_index(df: pd.DataFrame) -> pd.DataFrame:
 
 def format_indicators(df: pd.DataFrame, unit: float) -> pd.DataFrame:
     df = adjust_unit(df, unit)
-    melt_cols = ["cvm_id", "is_annual", "is_consolidated", "period_end"]
-    df = pd.melt(df, id_vars=melt_cols, var_name="indicator", value_name="value")
-
-    sort_cols = ["cvm_id", "is_consolidated", "period_end", "indicator"]
-    df.sort_values(by=sort_cols, inplace=True)
-
-    df["period_end"] = df["period_end"].astype("string")
-
-    index_cols = ["cvm_id", "is_consolidated", "indicator"]
-    df = (
-        pd.pivot(df, values="value", index=index_cols, columns=["period_end"])
-        .reset_index()
-        .set_index("indicator")
-    )
+    # The indicators rows of a company are sorted by period, so transposing
+    # the indicator columns spreads the periods into columns in a single step
+    id_cols = ["cvm_id", "name_id", "is_annual", "is_consolidated", "period_end"]
+    periods = df["period_end"].dt.strftime("%Y-%m-%d")
+    df = df.drop(columns=id_cols).set_axis(periods, axis="index").T
     df.columns.name = None
     df.index.name = None
     df = reorder_index(df)
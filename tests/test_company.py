@@ -1,4 +1,6 @@
+import pandas as pd
 import finlogic as fl
+from finlogic import data
 import pytest
 
 fl.load()
@@ -72,3 +74,47 @@ def test_indicators():
     assert roic_2021_con == 0.2149
     assert revenues_2009_con == 182.8338
     assert total_debt_2015_con == 493.0230
+
+
+def test_report_cache():
+    """Test that changing a returned report does not change the next ones."""
+    petro_con = fl.Company(9512, is_consolidated=True, acc_unit="b")
+
+    first_report = petro_con.report(report_type="assets")
+    first_report["2020-12-31"] = 0
+    second_report = petro_con.report(report_type="assets")
+    assets_2020 = round(second_report.query("acc_code == '1'")["2020-12-31"][0], 3)
+    assert assets_2020 == 987.419
+
+    # Changing the accounting unit resets the cached reports
+    petro_con.acc_unit = "m"
+    third_report = petro_con.report(report_type="assets")
+    assets_2020 = round(third_report.query("acc_code == '1'")["2020-12-31"][0])
+    assert assets_2020 == 987_419
+
+
+def test_report_restated_entry():
+    """Test that a restated account shows once in the report, with its last value."""
+    petro_con = fl.Company(9512, is_consolidated=True, acc_unit="b")
+    period_end = pd.Timestamp("2015-12-31")
+    # Company rows are sorted by account code and period, and a restated entry
+    # comes after the one it replaces
+    dfi = pd.DataFrame(
+        {
+            "acc_code": pd.Categorical(["1", "1", "1.01"]),
+            "acc_name": ["Ativo Total", "Ativo Total", "Ativo Circulante"],
+            "period_end": [period_end] * 3,
+            "acc_value": [100.0, 120.0, 30.0],
+        }
+    )
+    report = petro_con._build_report(dfi)
+    assert report["acc_code"].tolist() == ["1", "1.01"]
+    assert report["2015-12-31"].tolist() == [120.0, 30.0]
+
+
+def test_load_on_first_use():
+    """Test that the data is loaded when creating a company if it was not loaded."""
+    data.FINANCIALS_DF = pd.DataFrame()
+    petro_con = fl.Company(9512, is_consolidated=True, acc_unit="b")
+    assert not data.FINANCIALS_DF.empty
+    assert petro_con.tax_id == "33.000.167/0001-01"
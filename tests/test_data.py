@@ -1,4 +1,6 @@
 from datetime import date
+import pandas as pd
+import pytest
 import finlogic as fl
 from finlogic import data
 
@@ -22,3 +24,51 @@ def test_search_company():
     """
     # Check results
     assert set(search_result["cvm_id"]) == {25291}
+
+
+def test_result_dtypes():
+    """Test that search and rank results keep the data file column types."""
+    search_result = fl.search_company("3r")
+    rank_result = fl.rank(segment="electric utilities")
+    for df in [search_result, rank_result]:
+        assert df["cvm_id"].dtype == "int64"
+        for col in ["name_id", "segment"]:
+            assert not isinstance(df[col].dtype, pd.CategoricalDtype)
+    assert not isinstance(search_result["tax_id"].dtype, pd.CategoricalDtype)
+    segments = fl.search_segment("utilities")
+    assert not isinstance(segments.dtype, pd.CategoricalDtype)
+
+
+def test_rank():
+    """Test the rank method of the Database module with the default segment."""
+    rank_result = fl.rank(rank_by="roic", n=5)
+    assert 0 < len(rank_result) <= 5
+    assert rank_result["is_consolidated"].all()
+    assert rank_result["roic"].is_monotonic_decreasing
+
+
+def test_search_company_identifiers():
+    """Test the search_company method with the company identifiers."""
+    by_cvm_id = fl.search_company("9512", search_by="cvm_id")
+    by_tax_id = fl.search_company("33.000.167/0001-01", search_by="tax_id")
+    assert by_cvm_id["cvm_id"].tolist() == [9512]
+    assert by_tax_id["cvm_id"].tolist() == [9512]
+    with pytest.raises(ValueError):
+        fl.search_company("9512 or True", search_by="cvm_id")
+
+
+def test_info_reset_on_load():
+    """Test that the info summary is built again after each load."""
+    data.info()
+    assert not data.INFO_DF.empty
+    fl.load()
+    assert data.INFO_DF.empty
+    assert not data.info().empty
+
+
+def test_load_on_first_use():
+    """Test that the data is loaded on the first search if it was not loaded."""
+    data.FINANCIALS_DF = pd.DataFrame()
+    search_result = fl.search_company("3r")
+    assert not data.FINANCIALS_DF.empty
+    assert set(search_result["cvm_id"]) == {25291}